@@ -4,33 +4,35 @@ Applies executor fixes for piping into compound commands.
 Bean 211.7
 """
 
-def fix_executor_mod(content):
-    # Add BraceGroup handling in execute_statement
-    content = content.replace(
-        '''Statement::Subshell(statements) => self.execute_subshell(statements),
+import sys
+
+from fix_common import apply_fixes, compile_fixes, splice
+
+# Add BraceGroup handling in execute_statement
+OLD_EXECUTE_STATEMENT = b'''Statement::Subshell(statements) => self.execute_subshell(statements),
             Statement::BackgroundCommand(cmd) => self.execute_background(*cmd),
         }
     }
 
-    fn execute_command''',
-        '''Statement::Subshell(statements) => self.execute_subshell(statements),
+    fn execute_command'''
+
+NEW_EXECUTE_STATEMENT = b'''Statement::Subshell(statements) => self.execute_subshell(statements),
             Statement::BackgroundCommand(cmd) => self.execute_background(*cmd),
             Statement::BraceGroup(statements) => self.execute_brace_group(statements),
         }
     }
 
     fn execute_command'''
-    )
-    
-    # Add execute_brace_group method (after execute_subshell ends)
-    content = content.replace(
-        '''// The subshell's runtime changes (variables, cwd) are discarded
+
+# Add execute_brace_group method (after execute_subshell ends)
+OLD_EXECUTE_BRACE_GROUP = b'''// The subshell's runtime changes (variables, cwd) are discarded
         // Only the execution result (stdout, stderr, exit code) is returned
         Ok(result)
     }
 
-    fn execute_background''',
-        '''// The subshell's runtime changes (variables, cwd) are discarded
+    fn execute_background'''
+
+NEW_EXECUTE_BRACE_GROUP = b'''// The subshell's runtime changes (variables, cwd) are discarded
         // Only the execution result (stdout, stderr, exit code) is returned
         Ok(result)
     }
@@ -44,43 +46,45 @@ def fix_executor_mod(content):
     }
 
     fn execute_background'''
-    )
-    
-    return content
 
-def fix_executor_pipeline(content):
-    # Update stage_name match
-    content = content.replace(
-        '''let stage_name = match element {
+EXECUTOR_MOD_FIXES = compile_fixes([
+    (OLD_EXECUTE_STATEMENT, NEW_EXECUTE_STATEMENT),
+    (OLD_EXECUTE_BRACE_GROUP, NEW_EXECUTE_BRACE_GROUP),
+])
+
+def fix_executor_mod(content):
+    return splice(content, EXECUTOR_MOD_FIXES)
+
+# Update stage_name match
+OLD_STAGE_NAME = b'''let stage_name = match element {
                 PipelineElement::Command(cmd) => cmd.name.clone(),
                 PipelineElement::Subshell(_) => "subshell".to_string(),
             };
             let is_builtin = match element {
                 PipelineElement::Command(cmd) => builtins.is_builtin(&cmd.name),
                 PipelineElement::Subshell(_) => false,
-            };''',
-        '''let stage_name = match element {
-                PipelineElement::Command(cmd) => cmd.name.clone(),
-                PipelineElement::Subshell(_) => "subshell".to_string(),
-                PipelineElement::CompoundCommand(stmt) => match stmt.as_ref() {
-                    Statement::WhileLoop(_) => "while".to_string(),
-                    Statement::UntilLoop(_) => "until".to_string(),
-                    Statement::ForLoop(_) => "for".to_string(),
-                    Statement::IfStatement(_) => "if".to_string(),
-                    Statement::CaseStatement(_) => "case".to_string(),
-                    Statement::BraceGroup(_) => "brace_group".to_string(),
-                    _ => "compound".to_string(),
-                },
+            };'''
+
+NEW_STAGE_NAME = b'''let stage_name: std::borrow::Cow<'static, str> = match element {
+                PipelineElement::Command(cmd) => std::borrow::Cow::Owned(cmd.name.clone()),
+                PipelineElement::Subshell(_) => std::borrow::Cow::Borrowed("subshell"),
+                PipelineElement::CompoundCommand(stmt) => std::borrow::Cow::Borrowed(match stmt.as_ref() {
+                    Statement::WhileLoop(_) => "while",
+                    Statement::UntilLoop(_) => "until",
+                    Statement::ForLoop(_) => "for",
+                    Statement::IfStatement(_) => "if",
+                    Statement::CaseStatement(_) => "case",
+                    Statement::BraceGroup(_) => "brace_group",
+                    _ => "compound",
+                }),
             };
             let is_builtin = match element {
                 PipelineElement::Command(cmd) => builtins.is_builtin(&cmd.name),
                 PipelineElement::Subshell(_) | PipelineElement::CompoundCommand(_) => false,
             };'''
-    )
-    
-    # Update execute_element to handle CompoundCommand
-    content = content.replace(
-        '''/// Execute a single pipeline element, which can be a command or a subshell.
+
+# Update execute_element to handle CompoundCommand
+OLD_EXECUTE_ELEMENT = b'''/// Execute a single pipeline element, which can be a command or a subshell.
 fn execute_element(
     element: &PipelineElement,
     runtime: &mut Runtime,
@@ -95,8 +99,9 @@ fn execute_element(
             execute_subshell_in_pipeline(statements, runtime, builtins, stdin)
         }
     }
-}''',
-        '''/// Execute a single pipeline element, which can be a command, subshell, or compound command.
+}'''
+
+NEW_EXECUTE_ELEMENT = b'''/// Execute a single pipeline element, which can be a command, subshell, or compound command.
 fn execute_element(
     element: &PipelineElement,
     runtime: &mut Runtime,
@@ -164,32 +169,24 @@ fn execute_compound_in_pipeline(
         }
     }
 }'''
-    )
-    
-    return content
+
+EXECUTOR_PIPELINE_FIXES = compile_fixes([
+    (OLD_STAGE_NAME, NEW_STAGE_NAME),
+    (OLD_EXECUTE_ELEMENT, NEW_EXECUTE_ELEMENT),
+])
+
+def fix_executor_pipeline(content):
+    return splice(content, EXECUTOR_PIPELINE_FIXES)
 
 def main():
     # Fix executor/mod.rs
-    with open('src/executor/mod.rs', 'r') as f:
-        content = f.read()
-    
-    fixed = fix_executor_mod(content)
-    
-    with open('src/executor/mod.rs', 'w') as f:
-        f.write(fixed)
-    
-    print("Fixed src/executor/mod.rs")
+    missed = apply_fixes('src/executor/mod.rs', fix_executor_mod)
     
     # Fix executor/pipeline.rs
-    with open('src/executor/pipeline.rs', 'r') as f:
-        content = f.read()
-    
-    fixed = fix_executor_pipeline(content)
-    
-    with open('src/executor/pipeline.rs', 'w') as f:
-        f.write(fixed)
-    
-    print("Fixed src/executor/pipeline.rs")
+    missed += apply_fixes('src/executor/pipeline.rs', fix_executor_pipeline)
+
+    if missed:
+        sys.exit(f"{missed} anchor(s) not found, see the warnings above")
 
 if __name__ == '__main__':
     main()
@@ -4,29 +4,30 @@ Applies the fix for piping into while/until/compound commands.
 Bean 211.7: PARSER-BUG: Pipes into while/until/compound commands not supported
 """
 
-import re
+import sys
+
+from fix_common import apply_fixes, compile_fixes, splice
 
 # Fix 1: Update AST - add BraceGroup to Statement
-def fix_ast(content):
-    # Add BraceGroup to Statement enum
-    content = content.replace(
-        '    Subshell(Vec<Statement>),\n    BackgroundCommand(Box<Statement>),\n}',
-        '''    Subshell(Vec<Statement>),
+
+# Add BraceGroup to Statement enum
+OLD_STATEMENT_ENUM = b'    Subshell(Vec<Statement>),\n    BackgroundCommand(Box<Statement>),\n}'
+
+NEW_STATEMENT_ENUM = b'''    Subshell(Vec<Statement>),
     BackgroundCommand(Box<Statement>),
     /// Brace group: { commands; } - executes in current shell context
     BraceGroup(Vec<Statement>),
 }'''
-    )
-    
-    # Add CompoundCommand to PipelineElement enum
-    content = content.replace(
-        '''/// An element in a pipeline - either a regular command or a subshell
+
+# Add CompoundCommand to PipelineElement enum
+OLD_PIPELINE_ELEMENT_ENUM = b'''/// An element in a pipeline - either a regular command or a subshell
 #[derive(Debug, Clone, PartialEq, Serialize, Deserialize)]
 pub enum PipelineElement {
     Command(Command),
     Subshell(Vec<Statement>),
-}''',
-        '''/// An element in a pipeline - either a regular command, subshell, or compound command
+}'''
+
+NEW_PIPELINE_ELEMENT_ENUM = b'''/// An element in a pipeline - either a regular command, subshell, or compound command
 #[derive(Debug, Clone, PartialEq, Serialize, Deserialize)]
 pub enum PipelineElement {
     Command(Command),
@@ -34,14 +35,19 @@ pub enum PipelineElement {
     /// Compound commands (while, until, for, if, case, brace groups) as pipeline elements
     CompoundCommand(Box<Statement>),
 }'''
-    )
-    
-    return content
+
+AST_FIXES = compile_fixes([
+    (OLD_STATEMENT_ENUM, NEW_STATEMENT_ENUM),
+    (OLD_PIPELINE_ELEMENT_ENUM, NEW_PIPELINE_ELEMENT_ENUM),
+])
+
+def fix_ast(content):
+    return splice(content, AST_FIXES)
 
 # Fix 2: Update parser - modify parse_pipeline_element and add helpers
-def fix_parser(content):
-    # Replace parse_pipeline_element function
-    old_func = '''    fn parse_pipeline_element(&mut self) -> Result<Statement> {
+
+# Replace parse_pipeline_element function
+OLD_PARSE_PIPELINE_ELEMENT = b'''    fn parse_pipeline_element(&mut self) -> Result<Statement> {
         if self.match_token(&Token::LeftParen) {
             self.parse_subshell()
         } else if self.is_bare_assignment() {
@@ -52,8 +58,8 @@ def fix_parser(content):
     }
 
     /// Check if current position has a `NAME=VALUE` pattern (bare assignment).'''
-    
-    new_func = '''    fn parse_pipeline_element(&mut self) -> Result<Statement> {
+
+NEW_PARSE_PIPELINE_ELEMENT = b'''    fn parse_pipeline_element(&mut self) -> Result<Statement> {
         // Check for compound commands first (can appear after pipe)
         match self.peek() {
             Some(Token::While) => return self.parse_while_loop(),
@@ -126,61 +132,51 @@ def fix_parser(content):
     }
 
     /// Check if current position has a `NAME=VALUE` pattern (bare assignment).'''
-    
-    content = content.replace(old_func, new_func)
-    
-    # Update pipeline building to use helper
-    content = content.replace(
-        '''// Build elements list supporting both commands and subshells
+
+# Update pipeline building to use helper
+OLD_FIRST_ELEMENT = b'''// Build elements list supporting both commands and subshells
             let first_element = match first_statement {
                 Statement::Command(cmd) => PipelineElement::Command(cmd),
                 Statement::Subshell(stmts) => PipelineElement::Subshell(stmts),
                 _ => return Err(anyhow!("Only commands and subshells can be used in pipelines")),
-            };''',
-        '''// Build elements list supporting commands, subshells, and compound commands
+            };'''
+
+NEW_FIRST_ELEMENT = b'''// Build elements list supporting commands, subshells, and compound commands
             let first_element = Self::statement_to_pipeline_element(first_statement)?;'''
-    )
-    
-    content = content.replace(
-        '''let elem = match stmt {
+
+OLD_ELEM = b'''let elem = match stmt {
                     Statement::Command(cmd) => PipelineElement::Command(cmd),
                     Statement::Subshell(stmts) => PipelineElement::Subshell(stmts),
                     _ => return Err(anyhow!("Only commands and subshells can be used in pipelines")),
-                };''',
-        '''let elem = Self::statement_to_pipeline_element(stmt)?;'''
-    )
-    
-    # Update backward-compatible commands vec
-    content = content.replace(
-        'PipelineElement::Subshell(_) => None,',
-        'PipelineElement::Subshell(_) | PipelineElement::CompoundCommand(_) => None,'
-    )
-    
-    return content
+                };'''
+
+NEW_ELEM = b'''let elem = Self::statement_to_pipeline_element(stmt)?;'''
+
+# Update backward-compatible commands vec
+OLD_COMMANDS_VEC = b'PipelineElement::Subshell(_) => None,'
+
+NEW_COMMANDS_VEC = b'PipelineElement::Subshell(_) | PipelineElement::CompoundCommand(_) => None,'
+
+PARSER_FIXES = compile_fixes([
+    (OLD_PARSE_PIPELINE_ELEMENT, NEW_PARSE_PIPELINE_ELEMENT),
+    (OLD_FIRST_ELEMENT, NEW_FIRST_ELEMENT),
+    (OLD_ELEM, NEW_ELEM),
+    (OLD_COMMANDS_VEC, NEW_COMMANDS_VEC),
+])
+
+def fix_parser(content):
+    return splice(content, PARSER_FIXES)
 
 def main():
     # Fix AST
-    with open('src/parser/ast.rs', 'r') as f:
-        ast_content = f.read()
-    
-    fixed_ast = fix_ast(ast_content)
-    
-    with open('src/parser/ast.rs', 'w') as f:
-        f.write(fixed_ast)
-    
-    print("Fixed src/parser/ast.rs")
+    missed = apply_fixes('src/parser/ast.rs', fix_ast)
     
     # Fix parser
-    with open('src/parser/mod.rs', 'r') as f:
-        parser_content = f.read()
-    
-    fixed_parser = fix_parser(parser_content)
-    
-    with open('src/parser/mod.rs', 'w') as f:
-        f.write(fixed_parser)
-    
-    print("Fixed src/parser/mod.rs")
+    missed += apply_fixes('src/parser/mod.rs', fix_parser)
     
+    if missed:
+        sys.exit(f"{missed} anchor(s) not found, see the warnings above")
+
     print("\nNow run: cargo build --release")
     print("Then test: ./target/release/rush -c 'echo hello | while read x; do echo got-$x; done'")
 
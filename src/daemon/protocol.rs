@@ -174,10 +174,26 @@ pub fn encode_message(message: &Message, message_id: MessageId) -> io::Result<Ve
 ///
 /// Returns (message, message_id)
 pub fn decode_message<R: Read>(reader: &mut R) -> io::Result<(Message, MessageId)> {
-    // Read length prefix (4 bytes)
-    let mut len_bytes = [0u8; 4];
-    reader.read_exact(&mut len_bytes)?;
-    let payload_len = u32::from_le_bytes(len_bytes);
+    // Read into the whole fixed header (length prefix + message ID) at once,
+    // so an unbuffered stream usually costs one read instead of two, but
+    // only require the length prefix before validating it: a short frame
+    // must fail as too small rather than wait for a message ID
+    let mut header = [0u8; 8];
+    let mut filled = 0;
+    while filled < 4 {
+        match reader.read(&mut header[filled..]) {
+            Ok(0) => {
+                return Err(io::Error::new(
+                    io::ErrorKind::UnexpectedEof,
+                    "failed to fill whole buffer",
+                ))
+            }
+            Ok(n) => filled += n,
+            Err(e) if e.kind() == io::ErrorKind::Interrupted => {}
+            Err(e) => return Err(e),
+        }
+    }
+    let payload_len = u32::from_le_bytes([header[0], header[1], header[2], header[3]]);
 
     // Validate length
     if payload_len < 4 {
@@ -193,10 +209,8 @@ pub fn decode_message<R: Read>(reader: &mut R) -> io::Result<(Message, MessageId
         ));
     }
 
-    // Read message ID (4 bytes)
-    let mut id_bytes = [0u8; 4];
-    reader.read_exact(&mut id_bytes)?;
-    let message_id = u32::from_le_bytes(id_bytes);
+    reader.read_exact(&mut header[filled..])?;
+    let message_id = u32::from_le_bytes([header[4], header[5], header[6], header[7]]);
 
     // Read bincode payload
     let data_len = (payload_len - 4) as usize;
@@ -649,6 +663,18 @@ mod tests {
         assert!(result.is_err());
     }
 
+    #[test]
+    fn test_message_length_too_small() {
+        // A length prefix below the 4-byte message ID, with nothing after it,
+        // must be rejected without waiting for the rest of the header
+        for len in 0u32..4 {
+            let mut cursor = std::io::Cursor::new(len.to_le_bytes().to_vec());
+            let err = decode_message(&mut cursor).unwrap_err();
+            assert_eq!(err.kind(), io::ErrorKind::InvalidData);
+            assert_eq!(err.to_string(), "Message length too small");
+        }
+    }
+
     #[test]
     fn test_write_read_message() {
         let message = Message::ExecutionResult(ExecutionResult {
@@ -172,18 +172,19 @@ fn execute_pipeline_elements(
         // Record stage timing if collecting
         if let Some(start) = stage_start {
             let elapsed = start.elapsed();
-            let stage_name = match element {
-                PipelineElement::Command(cmd) => cmd.name.clone(),
-                PipelineElement::Subshell(_) => "subshell".to_string(),
-                PipelineElement::CompoundCommand(stmt) => match stmt.as_ref() {
-                    Statement::WhileLoop(_) => "while".to_string(),
-                    Statement::UntilLoop(_) => "until".to_string(),
-                    Statement::ForLoop(_) => "for".to_string(),
-                    Statement::IfStatement(_) => "if".to_string(),
-                    Statement::CaseStatement(_) => "case".to_string(),
-                    Statement::BraceGroup(_) => "brace_group".to_string(),
-                    _ => "compound".to_string(),
-                },
+            // Only command names need an owned String; the rest are static
+            let stage_name: std::borrow::Cow<'static, str> = match element {
+                PipelineElement::Command(cmd) => std::borrow::Cow::Owned(cmd.name.clone()),
+                PipelineElement::Subshell(_) => std::borrow::Cow::Borrowed("subshell"),
+                PipelineElement::CompoundCommand(stmt) => std::borrow::Cow::Borrowed(match stmt.as_ref() {
+                    Statement::WhileLoop(_) => "while",
+                    Statement::UntilLoop(_) => "until",
+                    Statement::ForLoop(_) => "for",
+                    Statement::IfStatement(_) => "if",
+                    Statement::CaseStatement(_) => "case",
+                    Statement::BraceGroup(_) => "brace_group",
+                    _ => "compound",
+                }),
             };
             let is_builtin = match element {
                 PipelineElement::Command(cmd) => builtins.is_builtin(&cmd.name),